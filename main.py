@@ -8,18 +8,31 @@ Utilizza OpenAI Whisper per la trascrizione e GPT per l'analisi e generazione di
 import os
 import sys
 import argparse
+import asyncio
+import contextlib
+import csv
+import io
 import subprocess
 import time
 import math
 import concurrent.futures
+import functools
+import hashlib
+import json
 import re
+import tempfile
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import TYPE_CHECKING, Iterator, List, Tuple, Optional
 
-# Third-party imports
-from openai import OpenAI
+# Third-party imports; openai (and its httpx/pydantic chain) is only
+# imported when a client is first needed, so --help stays fast
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    import numpy as np
+    from openai import AsyncOpenAI, OpenAI
+
 # Load environment variables
 load_dotenv()
 
@@ -30,32 +43,48 @@ WHISPER_MODEL = os.getenv("WHISPER_MODEL", "whisper-1")
 CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o-mini")
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
 MAX_PARALLEL_TASKS = int(os.getenv("MAX_PARALLEL_TASKS", "3"))
+MAX_PARALLEL_FILES = int(os.getenv("MAX_PARALLEL_FILES", "3"))
 SIZE_LIMIT_MB = int(os.getenv("SIZE_LIMIT_MB", "20"))
+CHUNK_FORMAT = os.getenv("CHUNK_FORMAT", "wav").lower()
+
+# Transcription backend: "openai" (Whisper API) or "local" (faster-whisper)
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "openai").lower()
+WHISPER_MODEL_LOCAL = os.getenv("WHISPER_MODEL_LOCAL", "large-v3")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "auto")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "auto")
+LOCAL_WINDOW_SECONDS = int(os.getenv("LOCAL_WINDOW_SECONDS", "600"))
+LOCAL_BATCH_SIZE = int(os.getenv("LOCAL_BATCH_SIZE", "16"))
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", "500"))
 
 # Derived constants
 SIZE_LIMIT = SIZE_LIMIT_MB * 1024 * 1024  # Convert to bytes
+# Uploads of large chunks can take minutes; a dead connection should fail fast
+API_TIMEOUT_SECONDS = 600.0
+API_CONNECT_TIMEOUT_SECONDS = 10.0
+CACHE_LIMIT = CACHE_MAX_MB * 1024 * 1024  # Convert to bytes
 TEMP_DIR = "temp"
 OUTPUT_DIR = "output"
+CACHE_DIR = "cache"
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_BYTES_PER_SECOND = AUDIO_SAMPLE_RATE * 2  # 16-bit mono PCM
+
+# Chunk encodings for API uploads: ffmpeg codec args, file extension, bytes per second
+CHUNK_FORMATS = {
+    "wav": (["-acodec", "pcm_s16le"], "wav", AUDIO_BYTES_PER_SECOND),
+    "opus": (["-acodec", "libopus", "-b:a", "24k"], "ogg", 24000 // 8),
+}
 
 # Supported file formats
-AUDIO_FORMATS = {'.wav', '.mp3', '.m4a', '.flac', '.aac', '.ogg', '.wma'}
-VIDEO_FORMATS = {'.mp4', '.mov', '.avi', '.mkv', '.wmv', '.flv', '.webm', '.m4v'}
+AUDIO_FORMATS = frozenset({'.wav', '.mp3', '.m4a', '.flac', '.aac', '.ogg', '.wma'})
+VIDEO_FORMATS = frozenset({'.mp4', '.mov', '.avi', '.mkv', '.wmv', '.flv', '.webm', '.m4v'})
 SUPPORTED_FORMATS = AUDIO_FORMATS | VIDEO_FORMATS
 
-# Initialize OpenAI client
-if not OPENAI_API_KEY:
-    print("❌ Error: OPENAI_API_KEY not found in environment variables.")
-    print("Please create a .env file with your OpenAI API key.")
-    sys.exit(1)
+# Filename cleaning patterns
+UNSAFE_FILENAME_CHARS = re.compile(r'[^\w\-_]')
+REPEATED_UNDERSCORES = re.compile(r'_+')
 
-client = OpenAI(
-    api_key=OPENAI_API_KEY,
-    organization=OPENAI_ORG_ID if OPENAI_ORG_ID else None
-)
-
-# Create necessary directories
-os.makedirs(TEMP_DIR, exist_ok=True)
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+# Marks chunks that could not be transcribed, so they are never cached
+TRANSCRIPTION_ERROR = "[ERROR]"
 
 
 def log_info(message: str):
@@ -84,13 +113,14 @@ def log_section(message: str):
     print("=" * (len(message) + 3))
 
 
+@functools.lru_cache(maxsize=256)
 def clean_filename(filepath: str) -> str:
     """Clean filename for safe file operations."""
     filename = Path(filepath).stem
     # Remove special characters and spaces
-    clean_name = re.sub(r'[^\w\-_]', '_', filename)
+    clean_name = UNSAFE_FILENAME_CHARS.sub('_', filename)
     # Remove consecutive underscores
-    clean_name = re.sub(r'_+', '_', clean_name)
+    clean_name = REPEATED_UNDERSCORES.sub('_', clean_name)
     # Remove leading/trailing underscores
     clean_name = clean_name.strip('_')
     return clean_name
@@ -100,7 +130,7 @@ def check_dependencies():
     """Check if required external dependencies are installed."""
     try:
         subprocess.run(["ffmpeg", "-version"], 
-                      capture_output=True, check=True)
+                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
         log_success("ffmpeg is installed")
     except (subprocess.CalledProcessError, FileNotFoundError):
         log_error("ffmpeg is not installed or not in PATH")
@@ -109,148 +139,375 @@ def check_dependencies():
         log_info("  Ubuntu: sudo apt install ffmpeg")
         log_info("  Windows: Download from https://ffmpeg.org/download.html")
         sys.exit(1)
+    
+    if WHISPER_BACKEND == "local":
+        try:
+            import faster_whisper  # noqa: F401
+            log_success("faster-whisper is installed")
+        except ImportError:
+            log_error("WHISPER_BACKEND=local requires faster-whisper")
+            log_info("Please install it: pip install faster-whisper")
+            sys.exit(1)
+
+
+@functools.lru_cache(maxsize=None)
+def get_client() -> "OpenAI":
+    """Create the OpenAI client once per process."""
+    import httpx
+    from openai import OpenAI
+    
+    return OpenAI(
+        api_key=OPENAI_API_KEY,
+        organization=OPENAI_ORG_ID if OPENAI_ORG_ID else None,
+        max_retries=MAX_RETRIES,
+        timeout=httpx.Timeout(API_TIMEOUT_SECONDS, connect=API_CONNECT_TIMEOUT_SECONDS)
+    )
 
 
-def extract_audio_from_video(video_path: str) -> str:
-    """Extract audio from video file."""
-    clean_name = clean_filename(video_path)
-    audio_path = f"{TEMP_DIR}/{clean_name}_extracted.wav"
+def create_async_client() -> "AsyncOpenAI":
+    """Create an async OpenAI client; it is tied to the event loop that first uses it."""
+    import httpx
+    from openai import AsyncOpenAI
     
-    log_info(f"Extracting audio: {video_path} → {audio_path}")
-    try:
-        subprocess.run([
-            "ffmpeg", "-i", video_path, 
-            "-vn",  # No video
-            "-acodec", "pcm_s16le",  # Audio codec
-            "-ar", "44100",  # Sample rate
-            "-ac", "2",  # Stereo
-            audio_path
-        ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        log_success("Audio extraction successful!")
-        return audio_path
-    except subprocess.CalledProcessError as e:
-        log_error(f"Error extracting audio from {video_path}: {e}")
-        return None
+    return AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        organization=OPENAI_ORG_ID if OPENAI_ORG_ID else None,
+        max_retries=MAX_RETRIES,
+        timeout=httpx.Timeout(API_TIMEOUT_SECONDS, connect=API_CONNECT_TIMEOUT_SECONDS)
+    )
 
 
-def convert_to_wav(audio_path: str) -> str:
-    """Convert audio file to WAV format."""
-    # If already extracted, return as-is
-    if audio_path.endswith("_extracted.wav"):
-        return audio_path
-        
-    clean_name = clean_filename(audio_path)
-    wav_path = f"{TEMP_DIR}/{clean_name}.wav"
+def format_timestamp(seconds: float) -> str:
+    """Format an offset in seconds as a [HH:MM:SS] transcription prefix."""
+    return f"[{int(seconds//3600):02d}:{int((seconds%3600)//60):02d}:{int(seconds%60):02d}]"
+
+
+@functools.lru_cache(maxsize=None)
+def get_local_pipeline():
+    """Load the local faster-whisper model once and wrap it for batched inference."""
+    from faster_whisper import WhisperModel, BatchedInferencePipeline
     
-    log_info(f"Converting: {audio_path} → {wav_path}")
+    log_info(f"Loading local Whisper model {WHISPER_MODEL_LOCAL} (device: {WHISPER_DEVICE})")
+    model = WhisperModel(
+        WHISPER_MODEL_LOCAL,
+        device=WHISPER_DEVICE,
+        compute_type=WHISPER_COMPUTE_TYPE
+    )
+    return BatchedInferencePipeline(model=model)
+
+
+def file_digest(path: str) -> str:
+    """Compute the SHA-256 of a file, streaming it through one reusable 1MB buffer."""
+    h = hashlib.sha256()
+    buffer = bytearray(1 << 20)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        if hasattr(os, "posix_fadvise"):
+            # Aggressive readahead; this pass also leaves the file in the page
+            # cache, so a following ffmpeg decode does not hit the disk again
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+def cache_key(*parts: str) -> str:
+    """Build a cache key from everything that affects a cached result."""
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def read_cache(key: str, kind: str) -> Optional[str]:
+    """Return a cached result, or None if it is not in the cache.
+    
+    The cache is best-effort: any error reading it counts as a miss.
+    """
+    path = f"{CACHE_DIR}/{key}.{kind}"
     try:
-        subprocess.run([
-            "ffmpeg", "-i", audio_path, 
-            "-ar", "44100", wav_path
-        ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        log_success("Conversion successful!")
-        return wav_path
-    except subprocess.CalledProcessError as e:
-        log_error(f"Error converting {audio_path}: {e}")
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except FileNotFoundError:
         return None
+    except (OSError, UnicodeDecodeError) as e:
+        log_warning(f"Could not read cache entry {path}: {e}")
+        return None
+    
+    # Mark as recently used for eviction; atime is unreliable on noatime/relatime mounts.
+    # Another process may have evicted the entry since it was read.
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return text
 
 
-def get_audio_duration(wav_path: str) -> float:
-    """Get the duration of an audio file."""
-    duration_cmd = [
-        "ffprobe", "-i", wav_path, 
-        "-show_entries", "format=duration", 
-        "-v", "quiet", "-of", "csv=p=0"
-    ]
-    duration_output = subprocess.run(duration_cmd, capture_output=True, text=True)
+def write_cache(key: str, kind: str, text: str):
+    """Store a result in the cache atomically, then evict old entries.
     
+    Failures only log a warning, so a full disk or a race with another
+    worker never loses a result that has already been paid for.
+    """
+    path = f"{CACHE_DIR}/{key}.{kind}"
+    tmp_path = f"{path}.{os.getpid()}.tmp"
     try:
-        duration = float(duration_output.stdout.strip())
-        log_info(f"Audio duration: {duration:.2f} seconds ({duration/60:.1f} minutes)")
-        return duration
-    except ValueError:
-        log_error(f"Could not determine duration of {wav_path}")
-        return None
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        evict_cache()
+    except OSError as e:
+        log_warning(f"Could not write cache entry {path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
 
 
-def create_chunks(wav_path: str, duration: float) -> List[Tuple[float, float, str]]:
-    """Split audio file into chunks if needed."""
-    file_size = os.path.getsize(wav_path)
-    clean_name = clean_filename(wav_path)
+def evict_cache():
+    """Remove least recently used cache entries until the cache fits CACHE_MAX_MB."""
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        # Entries can vanish under us when several workers evict at once
+        try:
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            continue
+    
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= CACHE_LIMIT:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total_size -= size
+
+
+@dataclass
+class MediaInfo:
+    """Container and first audio stream properties reported by ffprobe."""
+    duration: float
+    size: int
+    codec_name: Optional[str] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+
+
+def probe(file_path: str) -> Optional[MediaInfo]:
+    """Read duration, size and audio format of a file with a single ffprobe call."""
+    probe_cmd = [
+        "ffprobe", "-v", "quiet",
+        "-print_format", "json",
+        "-show_format",
+        "-show_streams", "-select_streams", "a:0",
+        file_path
+    ]
+    probe_output = subprocess.run(probe_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
     
-    # If file is already small enough, no need to chunk
-    if file_size <= SIZE_LIMIT:
-        log_info(f"File size ({file_size/1024/1024:.2f}MB) within limit. No need to chunk.")
-        return [(0, duration, wav_path)]
+    try:
+        info = json.loads(probe_output.stdout)
+        duration = float(info["format"]["duration"])
+    except (ValueError, KeyError):
+        log_error(f"Could not determine duration of {file_path}")
+        return None
     
-    # Calculate number of chunks needed
-    num_chunks = math.ceil(file_size / (SIZE_LIMIT * 0.9))  # 10% buffer
-    chunk_duration = duration / num_chunks
+    stream = (info.get("streams") or [{}])[0]
+    media_info = MediaInfo(
+        duration=duration,
+        size=int(info["format"].get("size", 0)),
+        codec_name=stream.get("codec_name"),
+        sample_rate=int(stream["sample_rate"]) if "sample_rate" in stream else None,
+        channels=stream.get("channels")
+    )
+    log_info(f"Audio duration: {duration:.2f} seconds ({duration/60:.1f} minutes)")
+    return media_info
+
+
+def create_chunks(source_path: str, media_info: MediaInfo, work_dir: str, clean_name: Optional[str] = None) -> List[Tuple[float, float, str]]:
+    """Decode the source to 16kHz mono chunks in work_dir in a single ffmpeg pass."""
+    duration = media_info.duration
+    clean_name = clean_name or clean_filename(source_path)
+    codec_args, extension, bytes_per_second = CHUNK_FORMATS[CHUNK_FORMAT]
+    
+    # Sources already in the WAV chunk format need no re-encode: small ones
+    # are uploaded as they are, large ones are split with a stream copy
+    if (CHUNK_FORMAT == "wav"
+            and media_info.codec_name == "pcm_s16le"
+            and media_info.sample_rate == AUDIO_SAMPLE_RATE
+            and media_info.channels == 1):
+        if Path(source_path).suffix.lower() == ".wav" and media_info.size <= SIZE_LIMIT:
+            log_info("Audio is already 16kHz mono PCM within the size limit. No need to convert.")
+            return [(0, duration, source_path)]
+        codec_args = ["-acodec", "copy"]
+    
+    # Whisper resamples to 16kHz mono anyway, so decoding straight to that
+    # format shrinks every chunk ~5.5x compared to 44.1kHz stereo; Opus
+    # shrinks it ~10x further, so most recordings fit in a single chunk
+    chunk_seconds = SIZE_LIMIT * 0.9 / bytes_per_second  # 10% buffer
+    num_chunks = math.ceil(duration / chunk_seconds)
+    
+    chunk_pattern = f"{work_dir}/{clean_name}_chunk%03d.{extension}"
+    segment_list = f"{work_dir}/{clean_name}_chunks.csv"
+    
+    log_info(f"Decoding {source_path} into {num_chunks} chunk(s) of 16kHz mono audio")
+    try:
+        subprocess.run([
+            "ffmpeg", "-y", "-i", source_path,
+            "-vn",  # No video
+            *codec_args,  # Audio codec
+            "-ar", str(AUDIO_SAMPLE_RATE),  # Sample rate
+            "-ac", "1",  # Mono
+            "-f", "segment",
+            "-segment_time", str(chunk_seconds),
+            "-segment_list", segment_list,
+            "-segment_list_type", "csv",
+            "-segment_list_entry_prefix", f"{work_dir}/",
+            "-reset_timestamps", "1",
+            chunk_pattern
+        ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except subprocess.CalledProcessError as e:
+        log_error(f"Error decoding {source_path}: {e}")
+        return None
     
-    # Create chunks
-    log_info(f"File size ({file_size/1024/1024:.2f}MB) exceeds limit. Splitting into {num_chunks} chunks.")
+    # The segment list records each chunk's exact start/end time
     chunks = []
+    with open(segment_list, newline="") as f:
+        for chunk_path, start_time, end_time in csv.reader(f):
+            chunks.append((float(start_time), float(end_time), chunk_path))
+    os.remove(segment_list)
     
-    for i in range(num_chunks):
-        start_time = i * chunk_duration
-        end_time = min((i + 1) * chunk_duration, duration)
-        chunk_path = f"{TEMP_DIR}/{clean_name}_chunk{i+1}.wav"
-        
-        # Use ffmpeg to extract the chunk
-        subprocess.run([
-            "ffmpeg", "-i", wav_path, 
-            "-ss", str(start_time), 
-            "-to", str(end_time),
-            "-c", "copy", chunk_path
-        ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        
-        chunks.append((start_time, end_time, chunk_path))
-        log_success(f"Created chunk {i+1}/{num_chunks}: {start_time:.2f}s to {end_time:.2f}s")
-    
+    log_success(f"Created {len(chunks)} chunk(s)")
     return chunks
 
 
-def transcribe_chunk(chunk_data: Tuple[float, float, str]) -> Tuple[str, str]:
-    """Transcribe audio chunk using OpenAI API with retry logic."""
+async def transcribe_chunk(aclient: "AsyncOpenAI", chunk_data: Tuple[float, float, str]) -> str:
+    """Transcribe audio chunk using OpenAI API; the client retries transient errors."""
     start_time, end_time, chunk_path = chunk_data
-    retries = 0
     
-    while retries < MAX_RETRIES:
-        try:
-            with open(chunk_path, "rb") as audio_file:
-                transcription = client.audio.transcriptions.create(
-                    model=WHISPER_MODEL,
-                    file=audio_file
-                )
-            
-            # Add timestamp prefix to the transcription
-            timestamp = f"[{int(start_time//3600):02d}:{int((start_time%3600)//60):02d}:{int(start_time%60):02d}]"
-            return timestamp, f"{timestamp} {transcription.text}"
+    # Add timestamp prefix to the transcription
+    timestamp = format_timestamp(start_time)
+    try:
+        # A (name, file) tuple is streamed by httpx in small blocks instead of
+        # being read into memory whole, as the SDK does for a path
+        with open(chunk_path, "rb") as audio_file:
+            transcription = await aclient.audio.transcriptions.create(
+                model=WHISPER_MODEL,
+                file=(os.path.basename(chunk_path), audio_file)
+            )
+    except Exception as e:
+        log_error(f"Failed to transcribe chunk {chunk_path}: {e}")
+        return f"{timestamp} {TRANSCRIPTION_ERROR} Failed to transcribe: {e}"
+    
+    return f"{timestamp} {transcription.text}"
+
+
+def stream_audio_windows(source_path: str, window_seconds: int) -> Iterator[Tuple[float, "np.ndarray"]]:
+    """Decode the source through an ffmpeg pipe into fixed-length float32 windows."""
+    import numpy as np
+    
+    window_bytes = AUDIO_BYTES_PER_SECOND * window_seconds
+    proc = subprocess.Popen([
+        "ffmpeg", "-i", source_path,
+        "-vn",  # No video
+        "-f", "s16le",  # Raw PCM, no container
+        "-ar", str(AUDIO_SAMPLE_RATE),  # Sample rate
+        "-ac", "1",  # Mono
+        "pipe:1"
+    ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=1 << 20)
+    
+    # ffmpeg blocks on the pipe while a window is being transcribed, so at
+    # most one window of decoded audio is held in memory
+    start_time = 0.0
+    try:
+        while True:
+            data = proc.stdout.read(window_bytes)
+            if not data:
+                break
+            audio = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+            yield start_time, audio
+            start_time += len(audio) / AUDIO_SAMPLE_RATE
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+    
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, proc.args)
+
+
+def transcribe_local(source_path: str) -> str:
+    """Transcribe locally with faster-whisper's batched pipeline."""
+    pipeline = get_local_pipeline()
+    
+    log_section(f"Transcribing locally in {LOCAL_WINDOW_SECONDS}s windows")
+    lines = []
+    for start_time, audio in stream_audio_windows(source_path, LOCAL_WINDOW_SECONDS):
+        segments, _ = pipeline.transcribe(
+            audio,
+            batch_size=LOCAL_BATCH_SIZE,
+            vad_filter=True,
+            chunk_length=30
+        )
+        
+        # Segments are lazy; consuming them is what runs the inference
+        lines.extend(f"{format_timestamp(start_time + seg.start)} {seg.text.strip()}" for seg in segments)
+        log_success(f"Transcribed up to {format_timestamp(start_time + len(audio) / AUDIO_SAMPLE_RATE)}")
+    
+    return "\n".join(lines)
+
+
+async def transcribe_chunks_async(chunks: List[Tuple[float, float, str]]) -> List:
+    """Transcribe all chunks concurrently, at most MAX_PARALLEL_TASKS at a time."""
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_TASKS)
+    completed = 0
+    
+    async with create_async_client() as aclient:
+        async def transcribe_limited(chunk):
+            nonlocal completed
+            async with semaphore:
+                transcription = await transcribe_chunk(aclient, chunk)
+            completed += 1
+            log_success(f"Completed transcription {completed}/{len(chunks)} ({format_timestamp(chunk[0])})")
+            return transcription
         
-        except Exception as e:
-            retries += 1
-            error_message = str(e)
-            log_warning(f"Error transcribing chunk {chunk_path} (attempt {retries}/{MAX_RETRIES}): {error_message}")
-            
-            # Progressively longer wait between retries
-            wait_time = 2 ** retries  # Exponential backoff
-            if wait_time > 60:
-                wait_time = 60  # Cap at 60 seconds
-            
-            log_info(f"Waiting {wait_time}s before retry...")
-            time.sleep(wait_time)
-            
-            # If this was the last retry, return an error message
-            if retries >= MAX_RETRIES:
-                log_error(f"Failed to transcribe chunk {chunk_path} after {MAX_RETRIES} attempts: {error_message}")
-                timestamp = f"[{int(start_time//3600):02d}:{int((start_time%3600)//60):02d}:{int(start_time%60):02d}]"
-                return timestamp, f"{timestamp} [ERROR] Failed to transcribe after {MAX_RETRIES} attempts: {error_message}"
+        # gather() returns results in submission order, i.e. timeline order
+        return await asyncio.gather(
+            *(transcribe_limited(chunk) for chunk in chunks),
+            return_exceptions=True
+        )
+
+
+def transcribe_chunks(chunks: List[Tuple[float, float, str]]) -> Tuple[str, int]:
+    """Transcribe chunks in parallel through the OpenAI API, in timeline order.
+    
+    Returns the joined transcription and the number of chunks that failed.
+    """
+    log_section(f"Transcribing {len(chunks)} chunks in parallel (max {MAX_PARALLEL_TASKS} at a time)")
+    # Ctrl-C cancels every pending request, including ones waiting to retry
+    results = asyncio.run(transcribe_chunks_async(chunks))
+    
+    transcriptions = []
+    failed = 0
+    for chunk_idx, result in enumerate(results):
+        if isinstance(result, Exception):
+            failed += 1
+            log_error(f"Error in chunk {chunk_idx+1}: {str(result)}")
+            continue
+        if TRANSCRIPTION_ERROR in result:
+            failed += 1
+        transcriptions.append(result)
+    
+    return "\n\n".join(transcriptions), failed
 
 
 def generate_summary_and_tasks(transcription_text: str, original_filename: str) -> str:
     """Generate summary and tasks from transcription using GPT."""
     log_section("Generating summary and tasks")
     
+    system_message = "Sei un assistente esperto nell'analisi di riunioni e nella creazione di documenti strutturati. Rispondi sempre in italiano con un formato professionale e chiaro."
     prompt = f"""
 Analizza questa trascrizione di una riunione/call e genera un documento strutturato con:
 
@@ -268,39 +525,39 @@ TRASCRIZIONE:
 {transcription_text}
 """
     
-    retries = 0
-    while retries < MAX_RETRIES:
-        try:
-            response = client.chat.completions.create(
-                model=CHAT_MODEL,
-                messages=[
-                    {"role": "system", "content": "Sei un assistente esperto nell'analisi di riunioni e nella creazione di documenti strutturati. Rispondi sempre in italiano con un formato professionale e chiaro."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=2000,
-                temperature=0.3
-            )
-            
-            summary = response.choices[0].message.content
-            log_success("Summary and tasks generated successfully!")
-            return summary
-            
-        except Exception as e:
-            retries += 1
-            error_message = str(e)
-            log_warning(f"Error generating summary (attempt {retries}/{MAX_RETRIES}): {error_message}")
-            
-            if retries < MAX_RETRIES:
-                wait_time = 2 ** retries
-                log_info(f"Waiting {wait_time}s before retry...")
-                time.sleep(wait_time)
-            else:
-                log_error(f"Failed to generate summary after {MAX_RETRIES} attempts")
-                return f"# Errore nella generazione del riassunto\n\nNon è stato possibile generare il riassunto per il file {original_filename}.\nErrore: {error_message}\n\n## Trascrizione originale\n\n{transcription_text}"
-
-
-def process_file(file_path: str) -> bool:
-    """Process a single audio/video file."""
+    # Keyed on the full prompt, so prompt or model changes invalidate it
+    summary_key = cache_key(CHAT_MODEL, system_message, prompt)
+    summary = read_cache(summary_key, "tasks.md")
+    if summary is not None:
+        log_success("Summary and tasks found in cache")
+        return summary
+    
+    try:
+        response = get_client().chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=2000,
+            temperature=0.3
+        )
+    except Exception as e:
+        log_error(f"Failed to generate summary: {e}")
+        return f"# Errore nella generazione del riassunto\n\nNon è stato possibile generare il riassunto per il file {original_filename}.\nErrore: {e}\n\n## Trascrizione originale\n\n{transcription_text}"
+    
+    summary = response.choices[0].message.content
+    log_success("Summary and tasks generated successfully!")
+    write_cache(summary_key, "tasks.md", summary)
+    return summary
+
+
+def process_file(file_path: str, clean_name: Optional[str] = None) -> bool:
+    """Process a single audio/video file.
+    
+    clean_name overrides the name used for the output files, so inputs that
+    share a stem do not overwrite each other's results.
+    """
     log_section(f"Processing {os.path.basename(file_path)}")
     
     # Check if file exists
@@ -315,103 +572,118 @@ def process_file(file_path: str) -> bool:
         log_info(f"Supported formats: {', '.join(sorted(SUPPORTED_FORMATS))}")
         return False
     
-    # Extract audio from video if needed
-    if file_ext in VIDEO_FORMATS:
-        audio_path = extract_audio_from_video(file_path)
-        if not audio_path:
-            return False
-    else:
-        audio_path = file_path
-    
-    # Convert audio to WAV
-    wav_path = convert_to_wav(audio_path)
-    if not wav_path:
-        return False
+    # One safe name for every temp and output file derived from this input
+    clean_name = clean_name or clean_filename(file_path)
     
-    # Get audio duration
-    duration = get_audio_duration(wav_path)
-    if not duration:
+    # Probe duration and audio format once for the whole pipeline
+    media_info = probe(file_path)
+    if not media_info:
         return False
+    duration = media_info.duration
     
-    # Create chunks if needed
-    chunks = create_chunks(wav_path, duration)
-    
-    # Transcribe each chunk in parallel
-    log_section(f"Transcribing {len(chunks)} chunks in parallel (max {MAX_PARALLEL_TASKS} workers)")
-    all_transcriptions = []
+    # Transcriptions are keyed on the file content, the model that produced
+    # them and the settings that change how the audio reaches the model,
+    # including anything that moves window/chunk boundaries and timestamps
+    if WHISPER_BACKEND == "local":
+        transcription_settings = (WHISPER_MODEL_LOCAL, f"window={LOCAL_WINDOW_SECONDS}")
+    else:
+        transcription_settings = (WHISPER_MODEL, f"format={CHUNK_FORMAT}", f"size={SIZE_LIMIT_MB}")
+    transcription_key = cache_key(file_digest(file_path), WHISPER_BACKEND, *transcription_settings)
+    full_transcription = read_cache(transcription_key, "transcription.txt")
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_PARALLEL_TASKS) as executor:
-        # Submit all transcription tasks
-        future_to_chunk = {executor.submit(transcribe_chunk, chunk): idx for idx, chunk in enumerate(chunks)}
-        
-        # Process as they complete
-        completed = 0
-        for future in concurrent.futures.as_completed(future_to_chunk):
-            chunk_idx = future_to_chunk[future]
+    if full_transcription is not None:
+        log_success("Transcription found in cache, skipping transcription")
+    else:
+        failed_chunks = 0
+        if WHISPER_BACKEND == "local":
+            # Audio is streamed from ffmpeg straight into the model, no temp files
             try:
-                timestamp, transcription = future.result()
-                all_transcriptions.append((timestamp, transcription))
-                completed += 1
-                log_success(f"Completed transcription {completed}/{len(chunks)} ({timestamp})")
+                full_transcription = transcribe_local(file_path)
+            except subprocess.CalledProcessError as e:
+                log_error(f"Error decoding {file_path}: {e}")
+                return False
             except Exception as e:
-                log_error(f"Error in chunk {chunk_idx+1}: {str(e)}")
-                
-    # Sort transcriptions by timestamp
-    all_transcriptions.sort()
-    sorted_transcriptions = [t[1] for t in all_transcriptions]
-    full_transcription = "\n\n".join(sorted_transcriptions)
+                # Model load or inference failure; fail this file, not the whole run
+                log_error(f"Error transcribing {file_path} locally: {e}")
+                return False
+        else:
+            # Decode audio (extracting it from video if needed) straight into
+            # chunks, in a temp dir private to this file so parallel workers
+            # never see each other's chunks; it is removed on any exit
+            with tempfile.TemporaryDirectory(prefix=f"{clean_name}_", dir=TEMP_DIR) as work_dir:
+                chunks = create_chunks(file_path, media_info, work_dir, clean_name=clean_name)
+                if not chunks:
+                    return False
+                full_transcription, failed_chunks = transcribe_chunks(chunks)
+        
+        # Leave partial transcriptions out of the cache so a re-run retries them
+        if not failed_chunks:
+            write_cache(transcription_key, "transcription.txt", full_transcription)
     
     # Create output filenames
-    clean_name = clean_filename(file_path)
     transcription_filename = f"{OUTPUT_DIR}/{clean_name}_transcription.txt"
     tasks_filename = f"{OUTPUT_DIR}/{clean_name}_tasks.md"
     
+    # Both output files share the same metadata block
+    base_name = os.path.basename(file_path)
+    metadata = (
+        f"**File originale:** {file_path}\n"
+        f"**Durata:** {duration:.2f} secondi ({duration/60:.1f} minuti)\n"
+        f"**Elaborato il:** {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+        "---\n\n"
+    )
+    
     # Save transcription
     with open(transcription_filename, "w", encoding="utf-8") as f:
-        f.write(f"# Trascrizione di {os.path.basename(file_path)}\n\n")
-        f.write(f"**File originale:** {file_path}\n")
-        f.write(f"**Durata:** {duration:.2f} secondi ({duration/60:.1f} minuti)\n")
-        f.write(f"**Elaborato il:** {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        f.write("---\n\n")
-        f.write(full_transcription)
+        f.writelines([f"# Trascrizione di {base_name}\n\n", metadata, full_transcription])
     
     log_success(f"Transcription saved to: {transcription_filename}")
     
     # Generate and save summary/tasks
-    summary = generate_summary_and_tasks(full_transcription, os.path.basename(file_path))
+    summary = generate_summary_and_tasks(full_transcription, base_name)
     with open(tasks_filename, "w", encoding="utf-8") as f:
-        f.write(f"# Analisi e Task - {os.path.basename(file_path)}\n\n")
-        f.write(f"**File originale:** {file_path}\n")
-        f.write(f"**Durata:** {duration:.2f} secondi ({duration/60:.1f} minuti)\n")
-        f.write(f"**Elaborato il:** {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        f.write("---\n\n")
-        f.write(summary)
+        f.writelines([f"# Analisi e Task - {base_name}\n\n", metadata, summary])
     
     log_success(f"Tasks and summary saved to: {tasks_filename}")
     
-    # Cleanup temporary files
-    for _, _, chunk_path in chunks:
-        if chunk_path != wav_path:  # Don't delete the main wav file if it's the only chunk
-            try:
-                os.remove(chunk_path)
-            except:
-                pass
-    
-    # Remove temporary wav file if it was created from video
-    if file_ext in VIDEO_FORMATS and wav_path.endswith("_extracted.wav"):
-        try:
-            os.remove(wav_path)
-        except:
-            pass
-    elif wav_path != audio_path:  # Remove converted wav if different from original
-        try:
-            os.remove(wav_path)
-        except:
-            pass
-    
     return True
 
 
+def unique_output_names(file_paths: List[str]) -> List[str]:
+    """Give every input a distinct output name; repeated stems get a numeric suffix."""
+    used = set()
+    names = []
+    for file_path in file_paths:
+        base_name = clean_filename(file_path)
+        name = base_name
+        suffix = 1
+        while name in used:
+            suffix += 1
+            name = f"{base_name}_{suffix}"
+        if name != base_name:
+            log_warning(f"Output name {base_name} already used, saving {file_path} as {name}")
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def process_file_buffered(file_path: str, clean_name: str) -> Tuple[bool, str]:
+    """Process a file in a worker process, capturing its log for ordered printing."""
+    buffer = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(buffer):
+            try:
+                success = process_file(file_path, clean_name)
+            except Exception as e:
+                log_error(f"Unexpected error processing {file_path}: {e}")
+                success = False
+    except KeyboardInterrupt:
+        # The parent stops collecting results on Ctrl-C, so show the partial log here
+        print(buffer.getvalue(), end="")
+        raise
+    return success, buffer.getvalue()
+
+
 def main():
     """Main function."""
     parser = argparse.ArgumentParser(
@@ -442,17 +714,70 @@ Formati supportati:
     
     args = parser.parse_args()
     
+    # Check OpenAI configuration
+    if not OPENAI_API_KEY:
+        log_error("OPENAI_API_KEY not found in environment variables.")
+        log_info("Please create a .env file with your OpenAI API key.")
+        return 1
+    
+    if CHUNK_FORMAT not in CHUNK_FORMATS:
+        log_error(f"Unsupported CHUNK_FORMAT: {CHUNK_FORMAT}")
+        log_info(f"Supported chunk formats: {', '.join(sorted(CHUNK_FORMATS))}")
+        return 1
+    
     # Check dependencies
     check_dependencies()
     
+    # Create necessary directories
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    
     # Process each file
     successful = 0
     total = len(args.files)
+    output_names = unique_output_names(args.files)
+    
+    # Each process would load its own copy of a local model, so only
+    # API-backed runs fan out across files
+    max_workers = 1 if WHISPER_BACKEND == "local" else min(MAX_PARALLEL_FILES, total)
     
-    for file_path in args.files:
-        if process_file(file_path):
-            successful += 1
-        print()  # Add spacing between files
+    if max_workers > 1:
+        log_info(f"Processing {total} files in parallel (max {max_workers} workers)")
+        queue = list(zip(args.files, output_names))
+        running = {}
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                while queue or running:
+                    # Submit only as many files as there are free workers, so
+                    # nothing sits queued in the pool when Ctrl-C arrives
+                    while queue and len(running) < max_workers:
+                        file_path, clean_name = queue.pop(0)
+                        log_info(f"Started {file_path}")
+                        future = executor.submit(process_file_buffered, file_path, clean_name)
+                        running[future] = file_path
+                    
+                    done, _ = concurrent.futures.wait(
+                        running, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        file_path = running.pop(future)
+                        success, output = future.result()
+                        log_info(f"Finished {file_path}")
+                        # Each file's log was buffered, so it prints as one block
+                        print(output, end="")
+                        if success:
+                            successful += 1
+                        print()  # Add spacing between files
+            except KeyboardInterrupt:
+                log_warning("Interrupted, not starting the remaining files")
+                executor.shutdown(wait=False, cancel_futures=True)
+                return 130
+    else:
+        for file_path, clean_name in zip(args.files, output_names):
+            if process_file(file_path, clean_name):
+                successful += 1
+            print()  # Add spacing between files
     
     # Final summary
     log_section("Processing Complete")